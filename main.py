@@ -1,24 +1,495 @@
+import asyncio
+import hashlib
+import json
+import math
+import multiprocessing
 import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from uuid import uuid4
+import numpy as np
 from dotenv import load_dotenv
+from langchain_classic.embeddings import CacheBackedEmbeddings
+from langchain_classic.storage import LocalFileStore
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_google_genai._common import GoogleGenerativeAIError
 from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, ServerlessSpec
+from pypdf import PdfReader
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to NumPy
+    njit = None
 
 load_dotenv()
 
+# Native output sizes of known embedding models, so no probe call is needed
+KNOWN_EMBEDDING_DIMENSIONS = {
+    "gemini-embedding-001": 3072,
+    "text-embedding-004": 768,
+}
+# Probed dimensions of other models, keyed by model name
+DIMENSION_CACHE_PATH = Path.home() / ".cache" / "semantic_engine" / "dims.json"
+
+# Metadata kept in Pinecone when chunk text is stored locally in a ChunkStore
+PINECONE_METADATA_KEYS = ("source", "page", "parent_id")
+
+# Below this many pages per worker, process start-up costs more than parsing
+PDF_PAGES_PER_WORKER = 16
+
+# Rows of int8 vectors widened to float32 at a time when Numba is unavailable
+QUANTIZED_BLOCK_ROWS = 4096
+
+
+def _chunked(items: list, size: int):
+    """Yield successive ``size``-length slices of ``items``."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+if njit is not None:
+    # Serial on purpose: parallel kernels abort under numba's default workqueue
+    # threading layer when searches call them from several threads at once
+    @njit(fastmath=True, cache=True)
+    def _dot_rows(query: np.ndarray, matrix: np.ndarray, out: np.ndarray):
+        for i in range(matrix.shape[0]):
+            total = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                total += query[j] * matrix[i, j]
+            out[i] = total
+
+
+def _cosine_scores(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    Dot product of a normalized query against rows of normalized vectors,
+    i.e. their cosine similarities. Uses a Numba kernel when available.
+    """
+    if njit is None:
+        return matrix @ query
+    out = np.empty(matrix.shape[0], dtype=np.float32)
+    _dot_rows(query, matrix, out)
+    return out
+
+
+def _quantized_scores(query: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarities of a normalized query against int8-quantized rows,
+    where row i approximates codes[i] * scales[i].
+    """
+    out = np.empty(codes.shape[0], dtype=np.float32)
+    if njit is None:
+        # Widen a block at a time so no full float32 copy is materialized
+        for start in range(0, codes.shape[0], QUANTIZED_BLOCK_ROWS):
+            block = codes[start:start + QUANTIZED_BLOCK_ROWS]
+            np.matmul(block.astype(np.float32), query, out=out[start:start + len(block)])
+    else:
+        _dot_rows(query, codes, out)
+    return out * scales
+
+
+def _embedding_dimension(
+    model_name: str,
+    output_dimensionality: int | None,
+    embeddings: Embeddings,
+) -> int:
+    """
+    Return the size of the vectors an embedding model produces.
+
+    Known models are looked up directly; other models are probed once with a
+    test query and the result is memoized in DIMENSION_CACHE_PATH.
+    """
+    name = model_name.removeprefix("models/")
+    if name in KNOWN_EMBEDDING_DIMENSIONS:
+        return output_dimensionality or KNOWN_EMBEDDING_DIMENSIONS[name]
+
+    key = f"{name}:{output_dimensionality or 'default'}"
+    try:
+        cached = json.loads(DIMENSION_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        cached = {}
+    if key in cached:
+        return cached[key]
+
+    print("Testing embedding dimensions...")
+    dimension = len(embeddings.embed_query("test"))
+    cached[key] = dimension
+    try:
+        DIMENSION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        DIMENSION_CACHE_PATH.write_text(json.dumps(cached))
+    except OSError:
+        pass
+    return dimension
+
+
+def _iter_pdf_pages(file_path: str, start: int = 0, stop: int | None = None):
+    """
+    Yield pages ``start`` to ``stop - 1`` of a PDF as one Document per page,
+    extracting each page's text only when it is requested.
+    """
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    # pypdf rebuilds the whole label list on every access, so read it once
+    page_labels = reader.page_labels
+    for i in range(start, total_pages if stop is None else stop):
+        yield Document(
+            page_content=reader.pages[i].extract_text(),
+            metadata={
+                "source": file_path,
+                "page": i,
+                "page_label": page_labels[i],
+                "total_pages": total_pages,
+            },
+        )
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> list[Document]:
+    """
+    Extract pages ``start`` to ``stop - 1`` of a PDF as one Document per page.
+
+    Runs inside worker processes, so it opens its own reader.
+    """
+    return list(_iter_pdf_pages(file_path, start, stop))
+
+
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Return the process pool shared by all PDF loads, so concurrent loads
+    never run more than cpu_count parser processes in total.
+
+    Workers are started by a fork server (spawn where unavailable): forking
+    the multi-threaded caller directly can deadlock the children.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else "spawn"
+                ),
+            )
+        return _pdf_pool
+
+
+def _load_pdf(file_path: str, max_workers: int | None = None) -> list[Document]:
+    """
+    Load a PDF with one Document per page, parsing page ranges in parallel
+    worker processes for large files.
+    """
+    global _pdf_pool
+    page_count = len(PdfReader(file_path).pages)
+    workers = min(max_workers or os.cpu_count() or 1, page_count // PDF_PAGES_PER_WORKER)
+    if workers <= 1:
+        return _extract_pdf_pages(file_path, 0, page_count)
+
+    step = -(-page_count // workers)
+    try:
+        futures = [
+            _get_pdf_pool().submit(_extract_pdf_pages, file_path, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        return [doc for future in futures for doc in future.result()]
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; replace it and parse here
+        with _pdf_pool_lock:
+            _pdf_pool = None
+        return _extract_pdf_pages(file_path, 0, page_count)
+
+
+def _expand_parents(results: list[tuple[Document, float]]) -> list[tuple[Document, float]]:
+    """
+    Replace child chunks with their parent chunk text, keeping only the
+    best-scoring child of each parent. Results without a parent pass through.
+    """
+    expanded = []
+    seen_parents = set()
+    for doc, score in results:
+        parent_id = doc.metadata.get("parent_id")
+        if parent_id is None:
+            expanded.append((doc, score))
+            continue
+        if parent_id in seen_parents:
+            continue
+        seen_parents.add(parent_id)
+        metadata = {k: v for k, v in doc.metadata.items() if k != "parent_text"}
+        parent_text = doc.metadata.get("parent_text", doc.page_content)
+        expanded.append((Document(page_content=parent_text, metadata=metadata), score))
+    return expanded
+
+
+def _wait_all(futures: list):
+    """
+    Block until every async Pinecone upsert has finished, re-raising errors.
+
+    REST upserts return ApplyResult objects (``get``); gRPC upserts return
+    concurrent futures (``result``).
+    """
+    for future in futures:
+        if hasattr(future, "result"):
+            future.result()
+        else:
+            future.get()
+
+
+def _dedupe_chunks(chunks: list[Document]) -> list[tuple[str, Document]]:
+    """
+    Drop chunks whose text was already seen.
+
+    Returns:
+        List of (id, chunk) tuples, where the id is a hex content hash so
+        re-indexing the same text overwrites the existing vector.
+    """
+    # dict keeps first-seen order and needs one hash lookup per chunk
+    unique: dict[str, Document] = {}
+    for chunk in chunks:
+        unique.setdefault(
+            hashlib.blake2b(chunk.page_content.encode(), digest_size=16).hexdigest(),
+            chunk,
+        )
+    return list(unique.items())
+
+
+class ChunkStore:
+    """
+    SQLite table of chunk text and metadata keyed by Pinecone vector id,
+    so Pinecone only has to store a few small metadata fields per vector.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+
+    def put(self, rows: list[tuple[str, Document]]):
+        """Insert or replace (id, chunk) rows."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, text, metadata) VALUES (?, ?, ?)",
+                [
+                    (chunk_id, chunk.page_content, json.dumps(chunk.metadata, default=str))
+                    for chunk_id, chunk in rows
+                ],
+            )
+
+    def get(self, ids: list[str]) -> dict[str, Document]:
+        """Return the stored chunks for the given ids; unknown ids are omitted."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=json.loads(metadata))
+            for chunk_id, text, metadata in rows
+        }
+
+    def clear(self):
+        """Delete all stored chunks."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+
+
+class InMemoryIndex:
+    """
+    Brute-force cosine index held in RAM, mirroring the Pinecone index so
+    small corpora can be searched without a network round-trip.
+
+    Vectors are stored as int8 with one float32 scale per row, a quarter
+    of the memory of float32 vectors and of the bytes scanned per query.
+    """
+
+    def __init__(self, dimension: int):
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._documents: list[Document] = []
+        self._codes = np.empty((0, dimension), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, rows: list[tuple[str, Document]], vectors: list[list[float]]):
+        """Insert or replace (id, chunk) rows with their embeddings."""
+        if not rows:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        # Symmetric per-row quantization: the largest component maps to ±127
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+
+        with self._lock:
+            new_rows = []
+            for i, (chunk_id, chunk) in enumerate(rows):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    self._rows[chunk_id] = len(self._documents)
+                    self._documents.append(chunk)
+                    new_rows.append(i)
+                else:
+                    self._documents[row] = chunk
+                    self._codes[row] = codes[i]
+                    self._scales[row] = scales[i]
+            if new_rows:
+                self._codes = np.concatenate([self._codes, codes[new_rows]])
+                self._scales = np.concatenate([self._scales, scales[new_rows]])
+
+    def search(self, query_vector: np.ndarray, k: int) -> list[tuple[Document, float]]:
+        """Return the k rows most similar to a normalized query vector."""
+        with self._lock:
+            if not self._documents:
+                return []
+            scores = _quantized_scores(query_vector, self._codes, self._scales)
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._documents[i], float(scores[i])) for i in top]
+
+
+class GeminiEmbeddings(GoogleGenerativeAIEmbeddings):
+    """
+    GoogleGenerativeAIEmbeddings that applies a fixed output_dimensionality
+    to every call (the upstream class only accepts it per call).
+    """
+
+    output_dimensionality: int | None = None
+
+    def embed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        kwargs.setdefault("output_dimensionality", self.output_dimensionality)
+        return super().embed_documents(texts, **kwargs)
+
+    def embed_query(self, text: str, **kwargs) -> list[float]:
+        kwargs.setdefault("output_dimensionality", self.output_dimensionality)
+        return super().embed_query(text, **kwargs)
+
+    async def aembed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        kwargs.setdefault("output_dimensionality", self.output_dimensionality)
+        return await super().aembed_documents(texts, **kwargs)
+
+    async def aembed_query(self, text: str, **kwargs) -> list[float]:
+        kwargs.setdefault("output_dimensionality", self.output_dimensionality)
+        return await super().aembed_query(text, **kwargs)
+
+
+class RetrievalEmbeddings(Embeddings):
+    """
+    Route documents and queries to separate embedders, so each side uses
+    its own Gemini task type (retrieval_document / retrieval_query).
+    """
+
+    def __init__(self, document_embeddings: Embeddings, query_embeddings: Embeddings):
+        self.document_embeddings = document_embeddings
+        self.query_embeddings = query_embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.document_embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.query_embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.document_embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.query_embeddings.aembed_query(text)
+
+
+class SplitMergeTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Recursive character splitter with a second merge pass.
+
+    After the recursive split, adjacent chunks are merged while the merged
+    text still fits in ``chunk_size``, and any chunk shorter than
+    ``min_chunk_size`` is folded into its neighbour instead of being embedded
+    on its own.
+    """
+
+    def __init__(self, min_chunk_size: int = 200, **kwargs):
+        super().__init__(**kwargs)
+        self._min_chunk_size = min_chunk_size
+
+    def split_text(self, text: str) -> list[str]:
+        chunks = super().split_text(text)
+        if len(chunks) < 2:
+            return chunks
+
+        # Locate each chunk in the source so merges keep the original text
+        # (and drop the overlap) instead of concatenating strings.
+        spans = []
+        search_from = 0
+        for chunk in chunks:
+            start = text.find(chunk, search_from)
+            if start < 0:
+                return chunks
+            spans.append([start, start + len(chunk)])
+            search_from = start + 1
+
+        merged = [spans[0]]
+        for start, end in spans[1:]:
+            if self._span_length(text, merged[-1][0], end) <= self._chunk_size:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end])
+
+        result = []
+        for start, end in merged:
+            if result and self._span_length(text, start, end) < self._min_chunk_size:
+                result[-1][1] = end
+            else:
+                result.append([start, end])
+        if len(result) > 1 and self._span_length(text, *result[0]) < self._min_chunk_size:
+            result[1][0] = result[0][0]
+            del result[0]
+
+        return [text[start:end] for start, end in result]
+
+    def _span_length(self, text: str, start: int, end: int) -> int:
+        """Length of text[start:end], without slicing when counting characters."""
+        if self._length_function is len:
+            return end - start
+        return self._length_function(text[start:end])
+
 
 class SemanticSearchEngine:
     def __init__(
         self,
         google_model_name: str = "gemini-embedding-001",
+        output_dimensionality: int | None = 768,
         google_api_key: str | None = None,
         pinecone_api_key: str | None = None,
         pinecone_index_name: str = "semantic-search",
+        embedding_cache_dir: str | None = ".embed_cache",
+        query_cache_size: int = 512,
+        query_cache_threshold: float = 0.97,
+        parent_chunk_size: int | None = None,
+        use_grpc: bool = False,
+        reranker_model: str | None = None,
+        chunk_store_path: str | None = None,
+        in_memory_limit: int = 0,
     ):
         """
         Initialize the semantic search engine with Google Gemini embeddings
@@ -26,46 +497,79 @@ class SemanticSearchEngine:
 
         Args:
             google_model_name: Google Generative AI embedding model name.
+            output_dimensionality: Size of the embedding vectors requested
+                from Gemini (gemini-embedding-001 supports 768, 1536 and
+                3072). Pass None for the model's default size.
             google_api_key: Optional explicit Google API key. If not provided,
                 GOOGLE_API_KEY will be read from the environment.
             pinecone_api_key: Optional explicit Pinecone API key. If not
                 provided, PINECONE_API_KEY will be read from the environment.
             pinecone_index_name: Name of the Pinecone index to use.
+            embedding_cache_dir: Directory used to cache document embeddings
+                on disk so identical chunks are never re-embedded. Pass None
+                to disable the cache.
+            query_cache_size: Maximum number of past queries kept in the
+                in-memory semantic query cache. 0 disables it.
+            query_cache_threshold: Cosine similarity above which a cached
+                query's results are reused for a new query.
+            parent_chunk_size: If set, documents are first split into parent
+                chunks of this size; only small child chunks are embedded and
+                searches return the parent text of each matched child.
+            use_grpc: Upsert vectors through Pinecone's gRPC client
+                (requires ``pinecone[grpc]``). Queries and index management
+                keep using the REST client.
+            reranker_model: Optional cross-encoder model name (e.g.
+                "BAAI/bge-reranker-base", requires ``sentence-transformers``).
+                When set, searches fetch 4x k candidates from Pinecone and
+                return the top k by cross-encoder score.
+            chunk_store_path: Optional SQLite file (e.g. "chunks.db") that
+                holds chunk text and metadata locally. When set, Pinecone
+                only stores source/page/parent_id per vector, and search
+                results are rebuilt from this file.
+            in_memory_limit: If set, and the Pinecone index holds no more
+                than this many vectors at start-up, they are loaded into an
+                in-memory index that answers searches without querying
+                Pinecone; vectors added later through this engine are
+                mirrored until the limit is exceeded. Only use it when this
+                process is the index's sole writer: upserts and deletes made
+                by other processes are not seen. 0 (default) disables it.
         """
         # Embeddings - Create base embeddings first
         api_key = google_api_key or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("Set GOOGLE_API_KEY env var or pass google_api_key.")
         
-        base_embeddings = GoogleGenerativeAIEmbeddings(
+        base_embeddings = GeminiEmbeddings(
             model=google_model_name,
             google_api_key=api_key,
             task_type="retrieval_document",
+            output_dimensionality=output_dimensionality,
+        )
+        query_embeddings = GeminiEmbeddings(
+            model=google_model_name,
+            google_api_key=api_key,
+            task_type="retrieval_query",
+            output_dimensionality=output_dimensionality,
         )
         
-        # Test to get actual dimension from base embeddings
-        print("Testing embedding dimensions...")
-        test_embedding = base_embeddings.embed_query("test")
-        actual_dimension = len(test_embedding)
-        print(f"✓ Base embeddings produce: {actual_dimension} dimensions")
-        
-        # Determine expected dimension based on model
-        if "gemini-embedding-001" in google_model_name:
-            expected_dimension = 3072
-        else:
-            expected_dimension = actual_dimension
-        
-        # Check if dimensions match
-        if actual_dimension != expected_dimension:
-            print(f"⚠ WARNING: Expected {expected_dimension} but got {actual_dimension}")
-            print(f"Using actual dimension: {actual_dimension}")
-            embedding_dimension = actual_dimension
+        embedding_dimension = _embedding_dimension(
+            google_model_name, output_dimensionality, base_embeddings
+        )
+        print(f"✓ Embeddings produce: {embedding_dimension} dimensions")
+
+        # Cache document embeddings on disk, keyed by a hash of the chunk text
+        if embedding_cache_dir:
+            document_embeddings = CacheBackedEmbeddings.from_bytes_store(
+                base_embeddings,
+                LocalFileStore(embedding_cache_dir),
+                namespace=f"{google_model_name}-{embedding_dimension}",
+                key_encoder="sha256",
+            )
         else:
-            print(f"✓ Dimensions match expected: {expected_dimension}")
-            embedding_dimension = expected_dimension
-        
-        # Use embeddings directly (no wrapper needed if dimensions are correct)
-        self.embeddings = base_embeddings
+            document_embeddings = base_embeddings
+
+        # Documents and queries are embedded with their own task type
+        self.embeddings = RetrievalEmbeddings(document_embeddings, query_embeddings)
 
         # Pinecone
         pc_key = pinecone_api_key or os.getenv("PINECONE_API_KEY")
@@ -75,10 +579,23 @@ class SemanticSearchEngine:
         self.pc = Pinecone(api_key=pc_key)
         self.index_name = pinecone_index_name
 
+        # Client used for bulk upserts; gRPC is faster but may be blocked
+        if use_grpc:
+            try:
+                from pinecone.grpc import PineconeGRPC
+            except ImportError as e:
+                raise ImportError(
+                    'use_grpc=True requires the gRPC extra: pip install "pinecone[grpc]"'
+                ) from e
+            self._upsert_client = PineconeGRPC(api_key=pc_key)
+        else:
+            self._upsert_client = self.pc
+
         # Create index if it doesn't exist
         existing_indexes = [idx.name for idx in self.pc.list_indexes()]
+        index_is_new = self.index_name not in existing_indexes
         
-        if self.index_name not in existing_indexes:
+        if index_is_new:
             print(f"Creating new Pinecone index '{self.index_name}'...")
             self.pc.create_index(
                 name=self.index_name,
@@ -109,25 +626,80 @@ class SemanticSearchEngine:
             print(f"✓ Index dimensions match!")
 
         self.vector_store = None
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
+        self.reranker_model = reranker_model
+        self._reranker = None
+        self._reranker_lock = threading.Lock()
+        self.chunk_store = ChunkStore(chunk_store_path) if chunk_store_path else None
+
+        # The in-memory mirror must hold every vector, so it starts from a copy
+        # of the Pinecone index and only while that fits within the limit
+        self.in_memory_limit = in_memory_limit
+        self.embedding_dimension = embedding_dimension
+        self.memory_index = None
+        if in_memory_limit > 0:
+            index = self.pc.Index(self.index_name)
+            total = 0 if index_is_new else index.describe_index_stats().get("total_vector_count", 0)
+            if total <= in_memory_limit:
+                self.memory_index = InMemoryIndex(embedding_dimension)
+                if total:
+                    self._fill_memory_index(index)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_lock = threading.Lock()
+        self.query_cache_size = query_cache_size
+        self.query_cache_threshold = query_cache_threshold
+        # query text -> (cache slot, results), least recently used first
+        self._query_cache: OrderedDict[str, tuple[int, list]] = OrderedDict()
+        # Normalized vector, k and query text per slot (k is -1 for free slots),
+        # preallocated so lookups run the kernel over them without copying
+        cache_slots = max(query_cache_size, 0)
+        self._cache_vectors = np.zeros((cache_slots, embedding_dimension), dtype=np.float32)
+        self._cache_ks = np.full(cache_slots, -1, dtype=np.int64)
+        self._cache_keys: list[str | None] = [None] * cache_slots
+        # Searches run concurrently on one shared engine; guards _query_cache
+        self._cache_lock = threading.Lock()
+        # Bumped whenever the index contents change, for external caches
+        self.index_version = 0
+        if parent_chunk_size:
+            self.parent_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=parent_chunk_size,
+                chunk_overlap=0,
+                length_function=len,
+            )
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=300,
+                chunk_overlap=50,
+                length_function=len,
+            )
+            # Sibling children collapse into one parent, so searches over-fetch
+            self._children_per_parent = math.ceil(parent_chunk_size / 300)
+        else:
+            self.parent_splitter = None
+            self._children_per_parent = 1
+            self.text_splitter = SplitMergeTextSplitter(
+                min_chunk_size=200,
+                chunk_size=1000,
+                chunk_overlap=200,
+                length_function=len,
+            )
 
-    def load_documents(self, file_path: str = None, directory_path: str = None):
+    def load_documents(
+        self,
+        file_path: str = None,
+        directory_path: str = None,
+        lazy: bool = False,
+    ):
         """
         Load the documents from files or directory.
 
         Args:
             file_path: path to the single document file (PDF, TXT, etc.)
             directory_path: path to a directory containing documents.
+            lazy: If True, return an iterator that loads one document (PDF
+                page) at a time instead of a list, for build_index_streaming.
         
         Returns:
-            List of document objects.
+            List of document objects, or an iterator of them if lazy is True.
         """
-        documents = []
-
         if directory_path:
             # load all documents from directory
             loader = DirectoryLoader(
@@ -136,44 +708,230 @@ class SemanticSearchEngine:
                 loader_cls=PyPDFLoader,
                 show_progress=True
             )
-            documents = loader.load()
+            return loader.lazy_load() if lazy else loader.load()
         elif file_path:
             # load single document
             file_extension = Path(file_path).suffix.lower()
 
             if file_extension == ".pdf":
-                loader = PyPDFLoader(file_path)
+                return _iter_pdf_pages(file_path) if lazy else _load_pdf(file_path)
             elif file_extension in (".md", ".txt"):
                 loader = TextLoader(file_path)
+                return loader.lazy_load() if lazy else loader.load()
             else:
                 raise ValueError(f"Unsupported file type: {file_extension}")
-
-            documents = loader.load()
         else:
             raise ValueError("Either file_path or directory_path must be provided")
 
-        return documents
-    
-    def build_index(self, documents: list[Document]):
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        Split documents into the chunks that get embedded.
+
+        With parent chunking enabled, each document is split into parent
+        chunks first and every child chunk records its parent's id and text
+        in metadata ("parent_id", "parent_text").
+
+        Returns:
+            List of chunk documents.
+        """
+        if self.parent_splitter is None:
+            return self.text_splitter.split_documents(documents)
+
+        chunks = []
+        for parent in self.parent_splitter.split_documents(documents):
+            parent_id = uuid4().hex
+            for child in self.text_splitter.split_documents([parent]):
+                child.metadata["parent_id"] = parent_id
+                child.metadata["parent_text"] = parent.page_content
+                chunks.append(child)
+        return chunks
+
+    def build_index(
+        self,
+        documents: list[Document],
+        batch_size: int = 64,
+        pool_threads: int = 30,
+        embed_batch_size: int = 100,
+        embed_workers: int = 8,
+    ):
         """
         Build vector index from documents using Pinecone.
+
+        Args:
+            documents: Documents to split, embed and store.
+            batch_size: Number of vectors sent per Pinecone upsert request.
+            pool_threads: Number of threads used for concurrent upserts.
+            embed_batch_size: Number of texts per Gemini embedding request.
+            embed_workers: Number of embedding requests kept in flight.
+        """
+        # split documents into chunks
+        chunks = self.split_documents(documents)
+        print(f"Split documents into {len(chunks)} chunks")
+        return self.build_index_from_chunks(
+            chunks,
+            batch_size=batch_size,
+            pool_threads=pool_threads,
+            embed_batch_size=embed_batch_size,
+            embed_workers=embed_workers,
+        )
+
+    def build_index_from_chunks(
+        self,
+        chunks: list[Document],
+        batch_size: int = 64,
+        pool_threads: int = 30,
+        embed_batch_size: int = 100,
+        embed_workers: int = 8,
+    ):
+        """
+        Build vector index from already-split chunks using Pinecone.
+
+        Args:
+            chunks: Chunk documents, e.g. from split_documents.
+            batch_size: Number of vectors sent per Pinecone upsert request.
+            pool_threads: Number of threads used for concurrent upserts.
+            embed_batch_size: Number of texts per Gemini embedding request.
+            embed_workers: Number of embedding requests kept in flight.
+        """
+        count = self.add_chunks(
+            chunks,
+            batch_size=batch_size,
+            pool_threads=pool_threads,
+            embed_batch_size=embed_batch_size,
+            embed_workers=embed_workers,
+        )
+        self.vector_store = PineconeVectorStore(
+            index=self.pc.Index(self.index_name),
+            embedding=self.embeddings,
+        )
+        print(f"✓ Pinecone index '{self.index_name}' populated with {count} vectors.")
+        return self.vector_store
+
+    def build_index_streaming(
+        self,
+        documents: Iterable[Document],
+        buffer_size: int = 100,
+        batch_size: int = 64,
+        pool_threads: int = 30,
+        embed_batch_size: int = 100,
+        embed_workers: int = 8,
+    ):
+        """
+        Build vector index from a stream of documents, e.g. from
+        load_documents(..., lazy=True).
+
+        Documents are split one at a time and chunks are upserted whenever
+        buffer_size of them have accumulated, so the full document text is
+        never held in memory at once.
+
+        Args:
+            documents: Iterable of documents to split, embed and store.
+            buffer_size: Number of chunks embedded and upserted per round.
+            batch_size: Number of vectors sent per Pinecone upsert request.
+            pool_threads: Number of threads used for concurrent upserts.
+            embed_batch_size: Number of texts per Gemini embedding request.
+            embed_workers: Number of embedding requests kept in flight.
+        """
+        options = dict(
+            batch_size=batch_size,
+            pool_threads=pool_threads,
+            embed_batch_size=embed_batch_size,
+            embed_workers=embed_workers,
+        )
+        count = 0
+        buffer: list[Document] = []
+        for document in documents:
+            buffer.extend(self.split_documents([document]))
+            if len(buffer) >= buffer_size:
+                count += self.add_chunks(buffer, **options)
+                buffer = []
+        if buffer:
+            count += self.add_chunks(buffer, **options)
+
+        self.vector_store = PineconeVectorStore(
+            index=self.pc.Index(self.index_name),
+            embedding=self.embeddings,
+        )
+        print(f"✓ Pinecone index '{self.index_name}' populated with {count} vectors.")
+        return self.vector_store
+
+    def add_chunks(
+        self,
+        chunks: list[Document],
+        batch_size: int = 64,
+        pool_threads: int = 30,
+        embed_batch_size: int = 100,
+        embed_workers: int = 8,
+    ) -> int:
+        """
+        Embed already-split chunks and upsert them into the Pinecone index.
+
+        Chunks are embedded in bulk and upserted with concurrent requests
+        instead of one serial upsert per batch.
+
+        Args:
+            chunks: Chunk documents, e.g. from split_documents.
+            batch_size: Number of vectors sent per Pinecone upsert request.
+            pool_threads: Number of threads used for concurrent upserts.
+            embed_batch_size: Number of texts per Gemini embedding request
+                (the API accepts at most 100).
+            embed_workers: Number of embedding requests kept in flight.
+
+        Returns:
+            Number of vectors upserted.
         """
         try:
-            # split documents into chunks
-            chunks = self.text_splitter.split_documents(documents)
-            print(f"Split documents into {len(chunks)} chunks")
-
-            # Build index
-            print("Building vector store...")
-            self.vector_store = PineconeVectorStore.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                index_name=self.index_name,
+            # Skip byte-identical chunks; the content hash doubles as vector id
+            unique = _dedupe_chunks(chunks)
+            if len(unique) < len(chunks):
+                print(f"Skipped {len(chunks) - len(unique)} duplicate chunks")
+            if not unique:
+                # e.g. whitespace-only text or a scanned PDF with no text layer
+                return 0
+
+            # Embed all chunks
+            print("Embedding chunks...")
+            vectors = self._embed_texts(
+                [chunk.page_content for _, chunk in unique],
+                batch_size=embed_batch_size,
+                max_workers=embed_workers,
             )
 
-            print(f"✓ Pinecone index '{self.index_name}' populated with {len(chunks)} vectors.")
-            return self.vector_store
-            
+            # Upsert in concurrent batches; "text" is the key PineconeVectorStore reads back
+            print("Upserting vectors...")
+            if self.chunk_store is None:
+                records = [
+                    (chunk_id, vector, {**chunk.metadata, "text": chunk.page_content})
+                    for (chunk_id, chunk), vector in zip(unique, vectors)
+                ]
+            else:
+                # Text and full metadata stay local; Pinecone gets the minimum
+                self.chunk_store.put(unique)
+                records = [
+                    (
+                        chunk_id,
+                        vector,
+                        {key: chunk.metadata[key] for key in PINECONE_METADATA_KEYS if key in chunk.metadata},
+                    )
+                    for (chunk_id, chunk), vector in zip(unique, vectors)
+                ]
+            # Closing the handle shuts down its upsert thread pool / gRPC channel
+            with self._upsert_client.Index(self.index_name, pool_threads=pool_threads) as index:
+                futures = [
+                    index.upsert(vectors=batch, async_req=True)
+                    for batch in _chunked(records, batch_size)
+                ]
+                _wait_all(futures)
+
+            if self.memory_index is not None:
+                if len(self.memory_index) + len(unique) <= self.in_memory_limit:
+                    self.memory_index.add(unique, vectors)
+                else:
+                    print("ℹ Index exceeds in_memory_limit; searching Pinecone from now on")
+                    self.memory_index = None
+            self._index_changed()
+            return len(records)
+
         except GoogleGenerativeAIError as e:
             msg = str(e)
             if "429" in msg or "quota" in msg.lower():
@@ -192,6 +950,89 @@ class SemanticSearchEngine:
                 print(msg)
             raise
 
+    def _fill_memory_index(self, index):
+        """
+        Copy every vector already in the Pinecone index into the in-memory
+        mirror, rebuilding each chunk from its metadata or the chunk store.
+        """
+        print("Loading existing vectors into memory...")
+        for ids in index.list():
+            vectors = index.fetch(ids=ids).vectors
+            if self.chunk_store is None:
+                rows = []
+                for chunk_id, vector in vectors.items():
+                    metadata = dict(vector.metadata or {})
+                    text = metadata.pop("text", "")
+                    rows.append((chunk_id, Document(id=chunk_id, page_content=text, metadata=metadata)))
+            else:
+                # Vectors missing from the store are skipped, as in _query_index
+                stored = self.chunk_store.get(list(vectors))
+                rows = [(chunk_id, stored[chunk_id]) for chunk_id in vectors if chunk_id in stored]
+            self.memory_index.add(rows, [vectors[chunk_id].values for chunk_id, _ in rows])
+        print(f"✓ Loaded {len(self.memory_index)} vectors into memory")
+
+    def _index_changed(self):
+        """
+        Invalidate cached query results after the index contents change.
+        """
+        with self._cache_lock:
+            self._query_cache.clear()
+            self._cache_ks.fill(-1)
+            self._cache_keys = [None] * len(self._cache_keys)
+            self.index_version += 1
+
+    def _embed_texts(
+        self,
+        texts: list[str],
+        batch_size: int = 100,
+        max_workers: int = 8,
+    ) -> list[list[float]]:
+        """
+        Embed texts in fixed-size batches, running several batches concurrently.
+
+        Returns:
+            One vector per input text, in input order.
+        """
+        batches = list(_chunked(texts, batch_size))
+        if len(batches) <= 1 or max_workers <= 1:
+            return [v for batch in batches for v in self.embeddings.embed_documents(batch)]
+
+        return self._run_async(self._aembed_texts(batches, concurrency=max_workers))
+
+    async def _aembed_texts(
+        self,
+        batches: list[list[str]],
+        concurrency: int = 8,
+    ) -> list[list[float]]:
+        """
+        Embed batches of texts with aembed_documents, keeping at most
+        ``concurrency`` requests in flight.
+
+        Returns:
+            One vector per input text, in input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def embed_batch(batch: list[str]) -> list[list[float]]:
+            async with semaphore:
+                return await self.embeddings.aembed_documents(batch)
+
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [v for batch_vectors in results for v in batch_vectors]
+
+    def _run_async(self, coro):
+        """
+        Run a coroutine on the engine's background event loop and wait for it.
+
+        Gemini's async client binds to the loop it was first used on, so every
+        call has to go through the same long-lived loop rather than asyncio.run.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
     def delete_index(self):
         """
         Delete the current Pinecone index.
@@ -199,6 +1040,11 @@ class SemanticSearchEngine:
         """
         if self.index_name in [idx.name for idx in self.pc.list_indexes()]:
             self.pc.delete_index(self.index_name)
+            if self.chunk_store is not None:
+                self.chunk_store.clear()
+            if self.in_memory_limit > 0:
+                self.memory_index = InMemoryIndex(self.embedding_dimension)
+            self._index_changed()
             print(f"✓ Deleted index: {self.index_name}")
         else:
             print(f"ℹ Index {self.index_name} does not exist")
@@ -211,6 +1057,7 @@ class SemanticSearchEngine:
             index_name=self.index_name,
             embedding=self.embeddings,
         )
+        self._index_changed()
         print(f"✓ Connected to Pinecone index '{self.index_name}'.")
     
     def search(self, query: str, k: int = 5):
@@ -224,10 +1071,7 @@ class SemanticSearchEngine:
         Returns:
             List of relevant document chunks
         """
-        if self.vector_store is None:
-            raise ValueError("Vector store not initialized. Build or load an index first.")
-        results = self.vector_store.similarity_search(query, k=k)
-        return results
+        return [doc for doc, _ in self._retrieve(query, k)]
 
     def search_with_scores(self, query: str, k: int = 5):
         """
@@ -237,13 +1081,136 @@ class SemanticSearchEngine:
             query: Search query
             k: Number of results to return
             
+        Returns:
+            List of tuples (Document, score)
+        """
+        return self._retrieve(query, k)
+
+    def _retrieve(self, query: str, k: int):
+        """
+        Fetch results for a query, expanding child chunks to their parents
+        and, if a reranker is configured, reranking 4x k candidates down to k.
+
+        With parent chunking, enough children are fetched that k distinct
+        parents remain after siblings are merged.
+
+        Returns:
+            List of tuples (Document, score)
+        """
+        fetch_k = k * self._children_per_parent
+        if self.reranker_model is None:
+            return _expand_parents(self._cached_search(query, fetch_k))[:k]
+
+        candidates = _expand_parents(self._cached_search(query, fetch_k * 4))
+        if not candidates:
+            return candidates
+        scores = self._get_reranker().predict([(query, doc.page_content) for doc, _ in candidates])
+        ranked = sorted(zip(candidates, scores), key=lambda pair: pair[1], reverse=True)
+        return [(doc, float(score)) for (doc, _), score in ranked[:k]]
+
+    def _get_reranker(self):
+        """
+        Load the cross-encoder reranker on first use.
+
+        Concurrent first searches share one load instead of each loading the model.
+        """
+        with self._reranker_lock:
+            if self._reranker is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise ImportError(
+                        "reranker_model requires sentence-transformers: "
+                        "pip install sentence-transformers"
+                    ) from e
+                self._reranker = CrossEncoder(self.reranker_model)
+        return self._reranker
+
+    def _query_index(self, query_vector: np.ndarray, k: int):
+        """
+        Query the index with an embedded query.
+
+        Small indexes are searched in memory. Otherwise Pinecone is queried;
+        with a chunk store, matches carry only minimal metadata, so their
+        text and metadata are loaded from the store by vector id.
+
+        Returns:
+            List of tuples (Document, score)
+        """
+        # Read once: add_chunks on another thread may drop the mirror
+        memory_index = self.memory_index
+        if memory_index is not None:
+            return memory_index.search(query_vector, k)
+
+        if self.chunk_store is None:
+            return self.vector_store.similarity_search_by_vector_with_score(
+                query_vector.tolist(), k=k
+            )
+
+        response = self.vector_store.index.query(
+            vector=query_vector.tolist(),
+            top_k=k,
+            include_metadata=False,
+        )
+        matches = response["matches"]
+        stored = self.chunk_store.get([match["id"] for match in matches])
+        return [
+            (stored[match["id"]], match["score"])
+            for match in matches
+            if match["id"] in stored
+        ]
+
+    def _cached_search(self, query: str, k: int):
+        """
+        Search through the semantic query cache.
+
+        The query is embedded once; if a previous query with the same k is
+        similar enough, its results are returned without calling Pinecone.
+        Otherwise the same vector is used for the Pinecone query.
+
         Returns:
             List of tuples (Document, score)
         """
         if self.vector_store is None:
             raise ValueError("Vector store not initialized. Build or load an index first.")
 
-        results = self.vector_store.similarity_search_with_score(query, k=k)
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector /= norm
+
+        if self.query_cache_size <= 0:
+            return self._query_index(query_vector, k)
+
+        with self._cache_lock:
+            version = self.index_version
+            if self._query_cache:
+                similarities = _cosine_scores(query_vector, self._cache_vectors)
+                # Free slots and queries cached for another k never match
+                similarities[self._cache_ks != k] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.query_cache_threshold:
+                    key = self._cache_keys[best]
+                    self._query_cache.move_to_end(key)
+                    return self._query_cache[key][1]
+
+        results = self._query_index(query_vector, k)
+        with self._cache_lock:
+            if self.index_version != version:
+                # The index changed mid-query; don't cache possibly stale results
+                return results
+            if query in self._query_cache:
+                slot = self._query_cache[query][0]
+            elif len(self._query_cache) >= self.query_cache_size:
+                # Evict the least recently used query and reuse its slot
+                _, (slot, _) = self._query_cache.popitem(last=False)
+            else:
+                slot = int(np.argmax(self._cache_ks == -1))
+            self._cache_vectors[slot] = query_vector
+            self._cache_ks[slot] = k
+            self._cache_keys[slot] = query
+            self._query_cache[query] = (slot, results)
+            self._query_cache.move_to_end(query)
         return results
 
     def get_collection_info(self):
@@ -1,11 +1,46 @@
 import streamlit as st
+import streamlit.components.v1 as components
 from main import SemanticSearchEngine
 from langchain_core.documents import Document
-import pandas as pd
-import plotly.express as px
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
+import atexit
+import hashlib
+import html
+import json
+import shutil
+import tempfile
 import time
 
+# Bulk uploads embed and upsert once this many chunks have accumulated; 800 fills
+# add_chunks' 8 concurrent embedding requests of 100 texts each
+BULK_BATCH_SIZE = 800
+
+# Per-session upload/search history keeps only the most recent entries
+HISTORY_MAXLEN = 500
+
+# Search results render in a components iframe, which does not see the page CSS
+RESULTS_CSS = """
+    body { font-family: "Source Sans Pro", sans-serif; margin: 0; }
+    .result-card {
+        padding: 1.5rem;
+        border-radius: 10px;
+        background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
+        margin-bottom: 1rem;
+        border-left: 5px solid #667eea;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    }
+    .result-card h3 { margin: 0 0 0.5rem 0; }
+    .score { color: white; padding: 0.2rem 0.8rem; border-radius: 15px; font-size: 0.85rem; font-weight: 600; }
+    .content { white-space: pre-wrap; }
+    details { margin-top: 0.75rem; }
+    summary { cursor: pointer; }
+    pre { white-space: pre-wrap; background: white; padding: 0.5rem; border-radius: 6px; }
+    .copy { cursor: pointer; border: 1px solid #ccc; border-radius: 6px; background: white; padding: 0.2rem 0.6rem; }
+"""
+
 # Page config
 st.set_page_config(
     page_title="Semantic Search Engine",
@@ -20,14 +55,6 @@ st.markdown("""
     .main {
         padding: 2rem;
     }
-    .result-card {
-        padding: 1.5rem;
-        border-radius: 10px;
-        background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
-        margin-bottom: 1rem;
-        border-left: 5px solid #667eea;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-    }
     .metric-card {
         background: white;
         padding: 1rem;
@@ -37,17 +64,137 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner="🚀 Initializing search engine...")
+def get_engine():
+    """Build the search engine once per Streamlit process."""
+    return SemanticSearchEngine()
+
+@st.cache_resource
+def get_executor():
+    """Thread pool for blocking engine calls, shared across sessions."""
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_data(ttl=600, max_entries=256, show_spinner=False)
+def cached_search(query: str, k: int, index_version: int):
+    """Search once per (query, k) for each version of the index."""
+    return get_engine().search_with_scores(query, k=k)
+
+@st.cache_data(ttl=15, show_spinner=False)
+def get_stats(index_version: int):
+    """Fetch Pinecone index stats, re-queried at most every 15 seconds."""
+    return get_engine().get_collection_info()
+
+@st.cache_resource
+def temp_dir() -> Path:
+    """Private scratch directory for uploads, removed when the server exits."""
+    path = Path(tempfile.mkdtemp(prefix="sse_"))
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+def file_digest(uploaded_file) -> str:
+    """SHA-256 of an uploaded file, read in 1 MB blocks."""
+    uploaded_file.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: uploaded_file.read(1 << 20), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_cached(digest: str, name: str, _uploaded_file) -> list[Document]:
+    """
+    Parse an uploaded file once per distinct content; re-uploads hit the cache.
+    Keyed on the file's digest, so the upload itself is never hashed or copied whole.
+    """
+    # Stream the upload to a private temp file in 1 MB blocks
+    _uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=Path(name).suffix, dir=temp_dir(), delete=False) as tmp:
+        shutil.copyfileobj(_uploaded_file, tmp, length=1 << 20)
+    temp_path = Path(tmp.name)
+    try:
+        docs = get_engine().load_documents(file_path=str(temp_path))
+    finally:
+        temp_path.unlink(missing_ok=True)
+    for doc in docs:
+        doc.metadata['source'] = name
+    return docs
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_upload_chart(history: tuple[tuple[str, int], ...]):
+    """Build the chunks-per-document bar chart once per distinct upload history."""
+    import pandas as pd
+    import plotly.express as px
+    
+    df = pd.DataFrame(list(history), columns=['title', 'chunks'])
+    return px.bar(df, x='title', y='chunks', title='Chunks per Document')
+
+def index_chunks(chunks: list[Document]):
+    """
+    Embed chunks in batched API calls and upsert the precomputed vectors,
+    creating the vector store on first use. Every upload path goes through here.
+    """
+    engine = st.session_state.engine
+    if engine.vector_store is None:
+        engine.build_index_from_chunks(chunks)
+    else:
+        engine.add_chunks(chunks)
+
+def render_results(results: list, show_scores: bool, show_metadata: bool) -> str:
+    """Render search results as one HTML document with client-side copy buttons."""
+    cards = []
+    for idx, (doc, score) in enumerate(results, 1):
+        score_pill = ""
+        if show_scores:
+            score_color = "green" if score > 0.8 else "orange" if score > 0.6 else "red"
+            score_pill = f'<span class="score" style="background: {score_color};">Score: {score:.4f}</span>'
+        metadata = ""
+        if show_metadata and doc.metadata:
+            metadata_json = json.dumps(doc.metadata, indent=2, default=str)
+            metadata = f'<details><summary>📋 View Metadata</summary><pre>{html.escape(metadata_json)}</pre></details>'
+        cards.append(
+            f'<div class="result-card"><h3>{idx} {score_pill}</h3>'
+            f'<p><b>Content:</b></p><div class="content">{html.escape(doc.page_content)}</div>'
+            f'{metadata}'
+            f'<p><button class="copy" data-idx="{idx - 1}">📋 Copy</button></p></div>'
+        )
+    # "</" is escaped so chunk text cannot close the script tag
+    texts = json.dumps([doc.page_content for doc, _ in results]).replace("</", "<\\/")
+    return (
+        f"<style>{RESULTS_CSS}</style>" + "\n".join(cards) +
+        f"<script>const texts = {texts};"
+        # navigator.clipboard only exists on HTTPS/localhost; fall back to execCommand
+        "function copyText(text) {"
+        "if (navigator.clipboard) { return navigator.clipboard.writeText(text); }"
+        "const area = document.createElement('textarea'); area.value = text;"
+        "document.body.appendChild(area); area.select(); document.execCommand('copy'); area.remove();"
+        "return Promise.resolve(); }"
+        "document.querySelectorAll('button.copy').forEach(b => b.addEventListener('click', () => {"
+        "copyText(texts[b.dataset.idx]).then(() => { b.textContent = '✅ Copied'; });"
+        "}));</script>"
+    )
+
+def toast_and_rerun(message: str):
+    """
+    Rerun so the sidebar and Search tab, which render before the Upload tab,
+    reflect the change; the toast is shown at the top of the next run.
+    """
+    st.session_state.pending_toast = message
+    st.rerun()
+
 # Initialize session state
-if 'engine' not in st.session_state:
-    with st.spinner("🚀 Initializing search engine..."):
-        try:
-            st.session_state.engine = SemanticSearchEngine()
-            st.session_state.initialized = True
-            st.session_state.upload_history = []
-            st.session_state.search_history = []
-        except Exception as e:
-            st.error(f"❌ Failed to initialize: {e}")
-            st.session_state.initialized = False
+if 'upload_history' not in st.session_state:
+    st.session_state.upload_history = deque(maxlen=HISTORY_MAXLEN)
+    st.session_state.search_history = deque(maxlen=HISTORY_MAXLEN)
+
+# The engine is shared by every session; only the first call builds it
+try:
+    st.session_state.engine = get_engine()
+    st.session_state.initialized = True
+except Exception as e:
+    st.error(f"❌ Failed to initialize: {e}")
+    st.session_state.initialized = False
+
+if 'pending_toast' in st.session_state:
+    st.toast(st.session_state.pop('pending_toast'), icon="✅")
 
 # Header
 col1, col2 = st.columns([3, 1])
@@ -69,7 +216,7 @@ with st.sidebar:
     # Index stats
     if st.session_state.initialized and st.session_state.engine.vector_store:
         try:
-            info = st.session_state.engine.get_collection_info()
+            info = get_stats(st.session_state.engine.index_version)
             vector_count = info.get('total_vector_count', 0)
             
             st.metric("📊 Total Vectors", vector_count)
@@ -97,14 +244,13 @@ with st.sidebar:
             try:
                 st.session_state.engine.delete_index()
                 st.session_state.engine.vector_store = None
-                st.session_state.upload_history = []
-                st.success("✅ Index cleared!")
-                time.sleep(1)
-                st.rerun()
+                st.session_state.upload_history = deque(maxlen=HISTORY_MAXLEN)
+                toast_and_rerun("Index cleared")
             except Exception as e:
                 st.error(f"❌ Failed: {e}")
     
     if st.button("🔄 Refresh Stats", use_container_width=True):
+        get_stats.clear()
         st.rerun()
 
 # Main tabs
@@ -119,18 +265,19 @@ with tab1:
     elif not st.session_state.engine.vector_store:
         st.warning("⚠️ No documents indexed. Upload documents first!")
     else:
-        # Search interface
-        query = st.text_input(
-            "🔎 What are you looking for?",
-            placeholder="Enter your search query...",
-            key="search_input"
-        )
-        
-        col1, col2, col3 = st.columns([2, 2, 6])
-        with col1:
-            search_btn = st.button("🔍 Search", type="primary", use_container_width=True)
-        with col2:
-            clear_btn = st.button("🧹 Clear Results", use_container_width=True)
+        # Search interface; the form reruns once per submit, not per keystroke
+        with st.form("search_form", clear_on_submit=False):
+            query = st.text_input(
+                "🔎 What are you looking for?",
+                placeholder="Enter your search query...",
+                key="search_input"
+            )
+            
+            col1, col2, col3 = st.columns([2, 2, 6])
+            with col1:
+                search_btn = st.form_submit_button("🔍 Search", type="primary", use_container_width=True)
+            with col2:
+                clear_btn = st.form_submit_button("🧹 Clear Results", use_container_width=True)
         
         if clear_btn:
             st.session_state.search_results = []
@@ -141,7 +288,15 @@ with tab1:
             with st.spinner("🔎 Searching..."):
                 try:
                     start_time = time.time()
-                    results = st.session_state.engine.search_with_scores(query, k=top_k)
+                    future = get_executor().submit(
+                        cached_search, query, top_k, st.session_state.engine.index_version
+                    )
+                    status = st.empty()
+                    while not future.done():
+                        status.caption(f"⏳ {time.time() - start_time:.1f}s")
+                        time.sleep(0.1)
+                    status.empty()
+                    results = future.result()
                     search_time = time.time() - start_time
                     
                     st.session_state.search_results = results
@@ -160,38 +315,13 @@ with tab1:
             st.divider()
             st.subheader(f"📄 Search Results ({len(st.session_state.search_results)})")
             
-            for idx, (doc, score) in enumerate(st.session_state.search_results, 1):
-                with st.container():
-                    col1, col2 = st.columns([0.05, 0.95])
-                    
-                    with col1:
-                        st.markdown(f"### {idx}")
-                    
-                    with col2:
-                        # Score
-                        if show_scores:
-                            score_color = "green" if score > 0.8 else "orange" if score > 0.6 else "red"
-                            st.markdown(
-                                f'<span style="background: {score_color}; color: white; padding: 0.2rem 0.8rem; '
-                                f'border-radius: 15px; font-size: 0.85rem; font-weight: 600;">'
-                                f'Score: {score:.4f}</span>',
-                                unsafe_allow_html=True
-                            )
-                        
-                        # Content
-                        st.markdown("**Content:**")
-                        st.write(doc.page_content)
-                        
-                        # Metadata
-                        if show_metadata and doc.metadata:
-                            with st.expander("📋 View Metadata"):
-                                st.json(doc.metadata)
-                        
-                        # Copy button
-                        if st.button(f"📋 Copy", key=f"copy_{idx}"):
-                            st.code(doc.page_content, language=None)
-                    
-                    st.divider()
+            # One iframe for all cards instead of several widgets per result
+            results = st.session_state.search_results
+            components.html(
+                render_results(results, show_scores, show_metadata),
+                height=min(900, 260 * len(results)),
+                scrolling=True,
+            )
 
 # TAB 2: UPLOAD
 with tab2:
@@ -222,12 +352,9 @@ with tab2:
                                 metadata={"source": title or "Text Input", "type": "text"}
                             )
                             
-                            chunks = st.session_state.engine.text_splitter.split_documents([doc])
+                            chunks = st.session_state.engine.split_documents([doc])
                             
-                            if st.session_state.engine.vector_store is None:
-                                st.session_state.engine.build_index([doc])
-                            else:
-                                st.session_state.engine.vector_store.add_documents(chunks)
+                            index_chunks(chunks)
                             
                             st.session_state.upload_history.append({
                                 'title': title or "Text Input",
@@ -235,9 +362,7 @@ with tab2:
                                 'type': 'text'
                             })
                             
-                            st.success(f"✅ Uploaded! Created {len(chunks)} chunks")
-                            time.sleep(1)
-                            st.rerun()
+                            toast_and_rerun(f"Uploaded {len(chunks)} chunks")
                         except Exception as e:
                             st.error(f"❌ Failed: {e}")
         
@@ -255,26 +380,14 @@ with tab2:
                 if st.button("📤 Upload File", type="primary", use_container_width=True):
                     with st.spinner("⚙️ Processing file..."):
                         try:
-                            temp_dir = Path("temp_uploads")
-                            temp_dir.mkdir(exist_ok=True)
-                            temp_path = temp_dir / uploaded_file.name
-                            
-                            with open(temp_path, "wb") as f:
-                                f.write(uploaded_file.getbuffer())
-                            
-                            docs = st.session_state.engine.load_documents(file_path=str(temp_path))
+                            docs = load_cached(file_digest(uploaded_file), uploaded_file.name, uploaded_file)
                             
                             for doc in docs:
                                 doc.metadata['source'] = title
                             
-                            chunks = st.session_state.engine.text_splitter.split_documents(docs)
-                            
-                            if st.session_state.engine.vector_store is None:
-                                st.session_state.engine.build_index(docs)
-                            else:
-                                st.session_state.engine.vector_store.add_documents(chunks)
+                            chunks = st.session_state.engine.split_documents(docs)
                             
-                            temp_path.unlink()
+                            index_chunks(chunks)
                             
                             st.session_state.upload_history.append({
                                 'title': title,
@@ -282,9 +395,7 @@ with tab2:
                                 'type': 'file'
                             })
                             
-                            st.success(f"✅ Uploaded! {len(chunks)} chunks from {len(docs)} pages")
-                            time.sleep(1)
-                            st.rerun()
+                            toast_and_rerun(f"Uploaded {len(chunks)} chunks from {len(docs)} pages")
                         except Exception as e:
                             st.error(f"❌ Failed: {e}")
         
@@ -301,41 +412,56 @@ with tab2:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                for i, file in enumerate(files):
-                    status_text.text(f"Processing {file.name}...")
+                # Chunks from several files are embedded and upserted together; their
+                # history entries are only recorded once that flush succeeds
+                pending_chunks: list[Document] = []
+                pending_history: list[dict] = []
+                failed = 0
+                
+                # Files are parsed in parallel; previously seen files come from the cache
+                with ThreadPoolExecutor(max_workers=min(8, len(files))) as loader:
+                    futures = {
+                        loader.submit(load_cached, file_digest(file), file.name, file): file.name
+                        for file in files
+                    }
                     
-                    try:
-                        temp_dir = Path("temp_uploads")
-                        temp_dir.mkdir(exist_ok=True)
-                        temp_path = temp_dir / file.name
-                        
-                        with open(temp_path, "wb") as f:
-                            f.write(file.getbuffer())
+                    for i, future in enumerate(as_completed(futures), start=1):
+                        name = futures[future]
+                        status_text.text(f"Processed {name}")
                         
-                        docs = st.session_state.engine.load_documents(file_path=str(temp_path))
-                        chunks = st.session_state.engine.text_splitter.split_documents(docs)
-                        
-                        if st.session_state.engine.vector_store is None:
-                            st.session_state.engine.build_index(docs)
-                        else:
-                            st.session_state.engine.vector_store.add_documents(chunks)
-                        
-                        temp_path.unlink()
+                        try:
+                            chunks = st.session_state.engine.split_documents(future.result())
+                            pending_chunks.extend(chunks)
+                            
+                            pending_history.append({
+                                'title': name,
+                                'chunks': len(chunks),
+                                'type': 'file'
+                            })
+                            
+                        except Exception as e:
+                            failed += 1
+                            st.error(f"Failed to process {name}: {e}")
                         
-                        st.session_state.upload_history.append({
-                            'title': file.name,
-                            'chunks': len(chunks),
-                            'type': 'file'
-                        })
+                        if len(pending_chunks) >= BULK_BATCH_SIZE or i == len(futures):
+                            try:
+                                if pending_chunks:
+                                    status_text.text(f"Indexing {len(pending_chunks)} chunks...")
+                                    index_chunks(pending_chunks)
+                                st.session_state.upload_history.extend(pending_history)
+                            except Exception as e:
+                                failed += len(pending_history)
+                                st.error(f"Failed to index chunks: {e}")
+                            pending_chunks = []
+                            pending_history = []
                         
-                    except Exception as e:
-                        st.error(f"Failed to process {file.name}: {e}")
-                    
-                    progress_bar.progress((i + 1) / len(files))
+                        progress_bar.progress(i / len(futures))
                 
-                status_text.text("✅ All files processed!")
-                time.sleep(1)
-                st.rerun()
+                if failed:
+                    # Keep the errors on screen instead of rerunning them away
+                    status_text.warning(f"⚠️ {failed} of {len(files)} files failed")
+                else:
+                    toast_and_rerun(f"Processed {len(files)} files")
 
 # TAB 3: ANALYTICS
 with tab3:
@@ -344,6 +470,9 @@ with tab3:
     if not st.session_state.upload_history:
         st.info("📭 No data yet. Upload documents to see analytics.")
     else:
+        # Only pay for pandas once there is something to show
+        import pandas as pd
+        
         col1, col2, col3 = st.columns(3)
         
         with col1:
@@ -361,18 +490,22 @@ with tab3:
         # Upload history
         if st.session_state.upload_history:
             st.subheader("📚 Upload History")
-            df = pd.DataFrame(st.session_state.upload_history)
+            df = pd.DataFrame(list(st.session_state.upload_history))
             st.dataframe(df, use_container_width=True)
             
             # Chart
-            fig = px.bar(df, x='title', y='chunks', title='Chunks per Document')
+            fig = build_upload_chart(
+                tuple((item['title'], item['chunks']) for item in st.session_state.upload_history)
+            )
             st.plotly_chart(fig, use_container_width=True)
         
         # Search history
         if st.session_state.search_history:
             st.divider()
             st.subheader("🔍 Recent Searches")
-            df_search = pd.DataFrame(st.session_state.search_history[-10:])
+            # deques don't slice; take the last 10 from the right end
+            recent = list(islice(reversed(st.session_state.search_history), 10))[::-1]
+            df_search = pd.DataFrame(recent)
             st.dataframe(df_search, use_container_width=True)
 
 # TAB 4: ABOUT